@@ -5,6 +5,8 @@ PATH_TO_TMP_FOLDER = PATH_TO_BASE_FOLDER.joinpath("tmp")
 SIZE_IN_SCREEN = 720
 CLUSTER_THRESHOLD = 10
 DEFAULT_BLUR_STEP = 50
+PNG_COMPRESSION_LEVEL = 1
+SCREENCAP_TIMEOUT_S = 10
 
 
 CAMERA = "main"
@@ -1,11 +1,16 @@
-import time
+import struct
+import subprocess
 from pathlib import Path
 from typing import Optional, TypedDict
 
+import cv2
+import numpy as np
 from device_manager import DeviceActions, DeviceInfo
 from device_manager.device_info import DeviceProperties
 from device_manager.manager_singleton import DeviceManagerSingleton as DeviceManager
 
+from camera_mapper.constants import SCREENCAP_TIMEOUT_S
+
 
 class MapperProperties(DeviceProperties, TypedDict, total=False):
     software_version: Optional[str]
@@ -23,13 +28,16 @@ class Device:
     recording the screen, taking screenshots, and interacting with the device.
     """
 
-    DEVICE_SCREENCAP_PATH = "/sdcard/DCIM/Camera/screencap.png"
+    SCREENCAP_HEADER_FORMAT = "<III"
+    # PixelFormat values for RGBA_8888 and RGBX_8888.
+    SCREENCAP_RGBA_FORMATS = (1, 2)
 
     def __init__(self) -> None:
         """
         Initializes the DeviceController class with default paths for storing video and screenshot files on the device.
         """
         self.manager = DeviceManager()
+        self.serial: Optional[str] = None
         self.properties: Optional[MapperProperties] = None
         self.info: Optional[DeviceInfo] = None
         self.actions: Optional[DeviceActions] = None
@@ -55,6 +63,7 @@ class Device:
             self.info = self.manager.get_device_info(matched_device)
             self.actions = self.manager.get_device_actions(matched_device)
             self.properties = self.get_properties()
+            self.serial = matched_device
         except IndexError:
             raise ValueError(
                 f"Device with IP: {ip} not found. Please check the IP and port."
@@ -62,30 +71,63 @@ class Device:
 
     def screen_shot(self, path: Path, tag: str) -> None:
         """
-        Takes a screenshot and pull it from the device, saving it to the specified local directory with a tag.
+        Takes a screenshot straight from the device, saving it to the specified local directory with a tag.
 
         Args:
             path (Path): The directory where the screenshot will be saved.
             tag (str): A tag to append to the screenshot file name.
         """
-        self.manager.execute_adb_command(
-            command=f"screencap -p {self.DEVICE_SCREENCAP_PATH}", shell=True
-        )
-        time.sleep(1)
-        if self.actions is None:
+        cv2.imwrite(str(path.joinpath(f"original_{tag}.png")), self.screen_image())
+
+    def screen_image(self) -> np.ndarray:
+        """
+        Captures the current screen straight into memory using the raw `screencap` output,
+        which skips the PNG encoding on the device and the decoding on the host.
+
+        Returns:
+            np.ndarray: The captured screen as a BGR image.
+        """
+        if self.serial is None:
+            raise RuntimeError(
+                "Device is not connected. Please connect to a device first."
+            )
+        try:
+            raw = subprocess.run(
+                ["adb", "-s", self.serial, "exec-out", "screencap"],
+                capture_output=True,
+                check=True,
+                timeout=SCREENCAP_TIMEOUT_S,
+            ).stdout
+        except (OSError, subprocess.SubprocessError) as e:
             raise RuntimeError(
-                "Device actions are not initialized. Please connect to a device first."
+                "Failed to retrieve screen capture from the device."
+            ) from e
+        header_size = struct.calcsize(self.SCREENCAP_HEADER_FORMAT)
+        if len(raw) < header_size:
+            raise ValueError("Failed to retrieve screen capture from the device.")
+        width, height, pixel_format = struct.unpack_from(
+            self.SCREENCAP_HEADER_FORMAT, raw
+        )
+        if pixel_format not in self.SCREENCAP_RGBA_FORMATS:
+            raise ValueError(
+                f"Unsupported screen capture pixel format: {pixel_format}."
             )
-        self.actions.pull_file(
-            remote_path=self.DEVICE_SCREENCAP_PATH,
-            local_path=str(path.joinpath(f"original_{tag}.png")),
+        # Newer Android versions append a color space field to the header, so the
+        # pixel data offset is taken from the end of the buffer.
+        offset = len(raw) - width * height * 4
+        if offset < header_size:
+            raise ValueError("Failed to retrieve screen capture from the device.")
+        rgba = np.frombuffer(raw, dtype=np.uint8, offset=offset).reshape(
+            height, width, 4
         )
-        time.sleep(1)
+        return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR)
 
-    def save_screen_gui_xml(self, path: Path) -> None:
+    def screen_gui_xml(self) -> str:
         """
-        Saves the current screen's GUI XML information from the device into
-        device_screen_gui.xml file in the specified path with a tag.
+        Retrieves the current screen's GUI XML information from the device.
+
+        Returns:
+            str: The GUI XML dump of the current screen.
         """
         if self.info is None:
             raise RuntimeError(
@@ -94,9 +136,16 @@ class Device:
         xml_info = self.info.get_screen_gui_xml()
         if xml_info is None:
             raise ValueError("Failed to retrieve screen GUI XML information.")
+        return xml_info
+
+    def save_screen_gui_xml(self, path: Path) -> None:
+        """
+        Saves the current screen's GUI XML information from the device into
+        device_screen_gui.xml file in the specified path with a tag.
+        """
         xml_file_path = path.joinpath("device_screen_gui.xml")
         with open(xml_file_path, "w", encoding="utf-8") as file:
-            file.write(xml_info)
+            file.write(self.screen_gui_xml())
 
     def get_properties(self) -> MapperProperties:
         """
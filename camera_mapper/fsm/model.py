@@ -3,12 +3,10 @@ import shutil
 import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from xml.etree.ElementTree import ElementTree
+from xml.etree.ElementTree import ElementTree, fromstring
 
 import cv2
 import numpy as np
-from doctr.io import DocumentFile
-from doctr.models import ocr_predictor
 from rich.console import Console
 
 from camera_mapper.constants import (
@@ -18,6 +16,7 @@ from camera_mapper.constants import (
     FLASH_MENU_NAMES,
     OBJECTS_OF_INTEREST,
     PATH_TO_TMP_FOLDER,
+    PNG_COMPRESSION_LEVEL,
     QUICK_CONTROL_NAMES,
     SWITCH_CAM_NAMES,
 )
@@ -27,7 +26,6 @@ from camera_mapper.screen_processing.image_processing import (
     draw_clickable_elements,
     get_blur_seekbar,
     get_middle_blur_circle_bar,
-    load_image,
     search_for_patterns,
 )
 from camera_mapper.screen_processing.xml_processing import (
@@ -61,6 +59,12 @@ class CameraMapperModel:
         self.xml_elements: Dict[str, np.ndarray] = {}
         self.xml_portrait: Dict[str, np.ndarray] = {}
         self.image_clickables: Dict[str, np.ndarray] = {}
+        self.screen: Optional[np.ndarray] = None
+        self.screen_xml: Optional[str] = None
+        self.screen_state: Optional[str] = None
+        # doctr loads PyTorch on import, so it is only imported when a model is built
+        from doctr.models import ocr_predictor
+
         self.ocr = ocr_predictor(pretrained=True)
         self.path = None
         self.mapping_elements: Dict[str, Optional[np.ndarray]] = {
@@ -108,11 +112,29 @@ class CameraMapperModel:
             Exception: If an error has been stored, it raises that error.
         """
         print(self.__error)
+        self.dump_screen()
         if self.device.actions is not None:
             self.device.actions.camera.close()
         if self.__error is not None:
             raise self.__error
 
+    def dump_screen(self) -> None:
+        """
+        Saves the last captured screen and GUI XML to the temporary folder, so a failed
+        mapping leaves them behind for debugging.
+        """
+        if not PATH_TO_TMP_FOLDER.exists():
+            return
+        if self.screen is not None:
+            cv2.imwrite(
+                str(PATH_TO_TMP_FOLDER.joinpath(f"original_{self.screen_state}.png")),
+                self.screen,
+            )
+        if self.screen_xml is not None:
+            PATH_TO_TMP_FOLDER.joinpath("device_screen_gui.xml").write_text(
+                self.screen_xml, encoding="utf-8"
+            )
+
     def in_error(self) -> bool:
         """
         Checks if there is an error stored in the model.
@@ -209,10 +231,14 @@ class CameraMapperModel:
     # region: Screen capture loop
     def capture_screen(self):
         """
-        Captures the current screen of the device and saves it to a temporary folder.
+        Captures the current screen of the device and its GUI XML into memory.
         """
-        self.device.screen_shot(path=PATH_TO_TMP_FOLDER, tag=f"{self.state}")
-        self.device.save_screen_gui_xml(path=PATH_TO_TMP_FOLDER)
+        try:
+            self.screen = self.device.screen_image()
+            self.screen_xml = self.device.screen_gui_xml()
+            self.screen_state = self.state
+        except (RuntimeError, ValueError) as e:
+            self.__error = e
 
     def process_screen_gui_xml(
         self, xml: ElementTree, image: np.ndarray
@@ -235,6 +261,7 @@ class CameraMapperModel:
             cv2.imwrite(
                 str(PATH_TO_TMP_FOLDER.joinpath("xml_clickable_elements.png")),
                 draw_clickable_elements(image, clickables),
+                [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION_LEVEL],
             )
         except Exception as e:
             self.__error = e
@@ -265,20 +292,19 @@ class CameraMapperModel:
                     new_dict["ZOOM_" + name] = box
         return new_dict
 
-    def apply_ocr_to_contours(self) -> Dict[str, np.ndarray]:
+    def apply_ocr_to_contours(self, image: np.ndarray) -> Dict[str, np.ndarray]:
         """
         Applies OCR to the contours of clickable elements to extract text.
+        Args:
+            image (np.ndarray): The captured screen image.
         Returns:
             Dict[str, np.ndarray]: A dictionary where keys are centroids of clickable elements
                                    and values are their bounds after applying OCR.
         """
         ocred = {}
-        path = str(PATH_TO_TMP_FOLDER.joinpath(f"original_{self.state}.png"))
-        img_doc = DocumentFile.from_images(path)
-        result = self.ocr(img_doc)
+        result = self.ocr([cv2.cvtColor(image, cv2.COLOR_BGR2RGB)])
 
-        width = self.device.properties.get("width", 0)
-        height = self.device.properties.get("height", 0)
+        height, width = image.shape[:2]
         for line in result.pages[0].blocks[0].lines:
             for word in line.words:
                 proc_word = word.value.strip().upper()
@@ -305,11 +331,12 @@ class CameraMapperModel:
             Dict[str, np.ndarray]: A dictionary where keys are centroids of clickable elements
                                    and values are their bounds after processing the image.
         """
-        contours = self.apply_ocr_to_contours()
+        contours = self.apply_ocr_to_contours(image)
         try:
             cv2.imwrite(
                 str(PATH_TO_TMP_FOLDER.joinpath("image_clickable_elements.png")),
                 draw_clickable_elements(image, contours),
+                [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION_LEVEL],
             )
         except Exception as e:
             self.__error = e
@@ -319,13 +346,14 @@ class CameraMapperModel:
         """
         Processes the captured screen image to extract information such as actions and menus.
         """
+        if self.in_error():
+            return
+        image = self.screen
+        if image is None or self.screen_xml is None:
+            self.__error = ValueError("Screen capture is not available.")
+            return
         try:
-            image = load_image(
-                PATH_TO_TMP_FOLDER.joinpath(f"original_{self.state}.png")
-            )
-            xml_tree = ElementTree(
-                file=PATH_TO_TMP_FOLDER.joinpath("device_screen_gui.xml")
-            )
+            xml_tree = ElementTree(fromstring(self.screen_xml))
         except Exception as e:
             self.__error = e
             return
@@ -392,10 +420,8 @@ class CameraMapperModel:
         Returns:
             Dict[str, ndarray]: A dictionary with centroids of aspect ratio elements.
         """
-        self.device.save_screen_gui_xml(path=PATH_TO_TMP_FOLDER)
-        xml_tree = ElementTree(
-            file=PATH_TO_TMP_FOLDER.joinpath("device_screen_gui.xml")
-        )
+        self.screen_xml = self.device.screen_gui_xml()
+        xml_tree = ElementTree(fromstring(self.screen_xml))
         _, elements = clickable_elements(xml_tree)
         if not elements:
             self.__error = ValueError(
@@ -542,7 +568,9 @@ class CameraMapperModel:
         Maps the blur menu in portrait mode by searching for it in the captured image.
         """
         self.capture_screen()
-        image = load_image(PATH_TO_TMP_FOLDER.joinpath(f"original_{self.state}.png"))
+        if self.in_error():
+            return
+        image = self.screen
         patterns = blur_patterns()
         bounds, self.__blur_button_idx = search_for_patterns(image, patterns)
         if self.__blur_button_idx < 0:
@@ -561,42 +589,33 @@ class CameraMapperModel:
             )
             time.sleep(1)
             self.capture_screen()
-            image = load_image(
-                PATH_TO_TMP_FOLDER.joinpath(f"original_{self.state}.png")
-            )
+            if self.in_error():
+                return
+            image = self.screen
             if self.__blur_button_idx in [1, 2, 3]:
-                self.mapping_elements["BLUR_BAR_MIDDLE"] = get_middle_blur_circle_bar(
-                    image
-                )
-                if self.mapping_elements["BLUR_BAR_MIDDLE"].size == 0:
+                middle = get_middle_blur_circle_bar(image)
+                if middle.size == 0:
                     self.__error = ValueError("Blur bar middle not found in the image.")
                     return
-                self.mapping_elements["BLUR_BAR_BEFORE"] = self.mapping_elements[
-                    "BLUR_BAR_MIDDLE"
-                ].copy()
-                self.mapping_elements["BLUR_BAR_NEXT"] = self.mapping_elements[
-                    "BLUR_BAR_MIDDLE"
-                ].copy()
-                self.mapping_elements["BLUR_BAR_BEFORE"][0] -= DEFAULT_BLUR_STEP
-                self.mapping_elements["BLUR_BAR_NEXT"][0] += DEFAULT_BLUR_STEP
+                before = middle.copy()
+                before[0] -= DEFAULT_BLUR_STEP
+                after = middle.copy()
+                after[0] += DEFAULT_BLUR_STEP
             else:
                 blur_seekbar = get_blur_seekbar(image)
                 if blur_seekbar.get("x1") == -1:
                     self.__error = ValueError("Blur seekbar not found in the image.")
                     return
-                self.mapping_elements["BLUR_BAR_MIDDLE"] = np.array(
-                    [
-                        blur_seekbar["x1"] + blur_seekbar["x2"] // 2,
-                        blur_seekbar["y1"] + blur_seekbar["y2"] // 2,
-                    ],
-                    dtype=np.int32,
-                )
-                self.mapping_elements["BLUR_BAR_BEFORE"] = np.array(
+                before = np.array(
                     [blur_seekbar["x1"], blur_seekbar["y1"]], dtype=np.int32
                 )
-                self.mapping_elements["BLUR_BAR_NEXT"] = np.array(
+                after = np.array(
                     [blur_seekbar["x2"], blur_seekbar["y2"]], dtype=np.int32
                 )
+                middle = (before + after) // 2
+            self.mapping_elements["BLUR_BAR_MIDDLE"] = middle
+            self.mapping_elements["BLUR_BAR_BEFORE"] = before
+            self.mapping_elements["BLUR_BAR_NEXT"] = after
 
     # endregion: Portrait Mode
 
@@ -1,5 +1,6 @@
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Tuple, TypedDict
+from typing import Dict, List, Optional, Tuple, TypedDict
 
 import cv2
 import numpy as np
@@ -60,96 +61,214 @@ def calculate_contour_distance(
         int: The calculated distance between the two contours.
     """
 
-    x1, y1, w1, h1 = cv2.boundingRect(contour1)
+    return calculate_rect_distance(
+        cv2.boundingRect(contour1), cv2.boundingRect(contour2)
+    )
+
+
+def calculate_rect_distance(rect1: cv2.typing.Rect, rect2: cv2.typing.Rect) -> int:
+    """
+    Calculate the distance between two bounding rectangles.
+
+    Args:
+        rect1 (cv2.typing.Rect): The first rectangle as (x, y, w, h).
+        rect2 (cv2.typing.Rect): The second rectangle as (x, y, w, h).
+
+    Returns:
+        int: The calculated distance between the two rectangles.
+    """
+    x1, y1, w1, h1 = rect1
     c_x1 = x1 + w1 / 2
     c_y1 = y1 + h1 / 2
 
-    x2, y2, w2, h2 = cv2.boundingRect(contour2)
+    x2, y2, w2, h2 = rect2
     c_x2 = x2 + w2 / 2
     c_y2 = y2 + h2 / 2
 
     return int(max(abs(c_x1 - c_x2) - (w1 + w2) / 2, abs(c_y1 - c_y2) - (h1 + h2) / 2))
 
 
+def calculate_rect_distance_matrix(
+    rects1: np.ndarray, rects2: np.ndarray
+) -> np.ndarray:
+    """
+    Calculate the distances between every pair of bounding rectangles of two arrays,
+    truncated the same way as `calculate_rect_distance`.
+
+    Args:
+        rects1 (np.ndarray): An (N, 4) array of rectangles as (x, y, w, h).
+        rects2 (np.ndarray): An (M, 4) array of rectangles as (x, y, w, h).
+
+    Returns:
+        np.ndarray: An (N, M) array with the distances between the rectangles.
+    """
+    sizes1 = rects1[:, None, 2:]
+    sizes2 = rects2[None, :, 2:]
+    centers1 = rects1[:, None, :2] + sizes1 / 2
+    centers2 = rects2[None, :, :2] + sizes2 / 2
+    gaps = np.abs(centers1 - centers2) - (sizes1 + sizes2) / 2
+    return np.trunc(gaps.max(axis=2))
+
+
+def merge_rects(rect1: cv2.typing.Rect, rect2: cv2.typing.Rect) -> cv2.typing.Rect:
+    """
+    Merge two bounding rectangles into the rectangle that bounds both,
+    the same as the bounding rectangle of the merged contours.
+
+    Args:
+        rect1 (cv2.typing.Rect): The first rectangle as (x, y, w, h).
+        rect2 (cv2.typing.Rect): The second rectangle as (x, y, w, h).
+
+    Returns:
+        cv2.typing.Rect: The merged rectangle as (x, y, w, h).
+    """
+    x = min(rect1[0], rect2[0])
+    y = min(rect1[1], rect2[1])
+    w = max(rect1[0] + rect1[2], rect2[0] + rect2[2]) - x
+    h = max(rect1[1] + rect1[3], rect2[1] + rect2[3]) - y
+    return (x, y, w, h)
+
+
+def cluster_rects(
+    rects: np.ndarray, threshold_distance: float
+) -> Tuple[List[List[int]], np.ndarray]:
+    """
+    Perform agglomerative clustering to merge bounding rectangles that are within a certain distance of each other.
+
+    Merging two clusters never increases their distance to the others, so each cluster
+    only keeps track of its nearest neighbor, updated in linear time after every merge.
+    Ties are broken towards the lowest indices, so clusters are merged in the same order
+    as a full rescan of every pair would. Merged clusters are flagged as dead instead of
+    being removed, so no array is shifted while merging.
+
+    Args:
+        rects (np.ndarray): An (N, 4) array of rectangles as (x, y, w, h).
+        threshold_distance (float): The distance threshold for merging rectangles.
+
+    Returns:
+        Tuple[List[List[int]], np.ndarray]: The indices of the rectangles in each cluster, in
+                                            merge order, and an array with the rectangle
+                                            bounding each cluster.
+    """
+    groups = [[index] for index in range(len(rects))]
+    rects = np.array(rects, dtype=np.float64).reshape(-1, 4)
+    if len(groups) < 2:
+        return groups, rects
+
+    distances = calculate_rect_distance_matrix(rects, rects)
+    np.fill_diagonal(distances, np.inf)
+    nearest = distances.argmin(axis=1)
+    nearest_distances = distances[np.arange(len(groups)), nearest]
+    alive = np.ones(len(groups), dtype=bool)
+
+    while True:
+        index1 = int(nearest_distances.argmin())
+        if not nearest_distances[index1] < threshold_distance:
+            break
+        # No lower cluster is as close to anyone, so the partner is above index1 and
+        # only the lowest of the tied ones has to be picked.
+        partner_distances = calculate_rect_distance_matrix(
+            rects[index1 : index1 + 1], rects
+        )[0]
+        partner_distances[~alive] = np.inf
+        partner_distances[index1] = np.inf
+        index2 = int(np.flatnonzero(partner_distances == nearest_distances[index1])[0])
+
+        rects[index1] = merge_rects(rects[index1], rects[index2])
+        groups[index1].extend(groups[index2])
+        alive[index2] = False
+        nearest_distances[index2] = np.inf
+
+        # The merged cluster is at least as close to every other cluster as both of
+        # its parts were, so it becomes the nearest neighbor of whoever pointed to
+        # either part or is now closer to it.
+        merged_distances = calculate_rect_distance_matrix(
+            rects[index1 : index1 + 1], rects
+        )[0]
+        merged_distances[~alive] = np.inf
+        merged_distances[index1] = np.inf
+        closer = alive & (
+            (nearest == index1)
+            | (nearest == index2)
+            | (merged_distances < nearest_distances)
+        )
+        nearest[closer] = index1
+        nearest_distances[closer] = merged_distances[closer]
+        nearest[index1] = merged_distances.argmin()
+        nearest_distances[index1] = merged_distances[nearest[index1]]
+
+    survivors = np.flatnonzero(alive)
+    return [groups[index] for index in survivors], rects[survivors]
+
+
 def agglomerative_cluster(
-    contours: List[np.ndarray], threshold_distance: int
+    contours: List[np.ndarray], threshold_distance: float
 ) -> List[np.ndarray]:
     """
     Perform agglomerative clustering to merge contours that are within a certain distance of each other.
 
+    The contours are clustered by their bounding rectangles, so each contour is copied
+    only once when the clusters are concatenated, in merge order, at the end.
+
     Args:
         contours (list[np.ndarray]): A list of contours.
-        threshold_distance (int): The distance threshold for merging contours.
+        threshold_distance (float): The distance threshold for merging contours.
 
     Returns:
         list[np.ndarray]: The clustered contours.
     """
 
-    current_contours = contours
-    while len(current_contours) > 1:
-        min_distance = None
-        min_coordinate = None
-
-        for x in range(len(current_contours) - 1):
-            for y in range(x + 1, len(current_contours)):
-                distance = calculate_contour_distance(
-                    current_contours[x], current_contours[y]
-                )
-                if min_distance is None:
-                    min_distance = distance
-                    min_coordinate = (x, y)
-                elif distance < min_distance:
-                    min_distance = distance
-                    min_coordinate = (x, y)
-
-        if (
-            min_distance is not None
-            and min_coordinate is not None
-            and min_distance < threshold_distance
-        ):
-            index1, index2 = min_coordinate
-            current_contours[index1] = merge_contours(
-                current_contours[index1], current_contours[index2]
-            )
-            current_contours.pop(index2)
-        else:
-            break
+    if len(contours) < 2:
+        return list(contours)
 
-    return current_contours
+    groups, _ = cluster_rects(
+        np.array([cv2.boundingRect(contour) for contour in contours]),
+        threshold_distance,
+    )
+    return [
+        np.concatenate([contours[index] for index in group], axis=0) for group in groups
+    ]
 
 
-def find_contours_in_image(image: cv2.typing.MatLike) -> Dict[str, np.ndarray]:
+def find_contours_in_image(
+    image: cv2.typing.MatLike, max_size: Optional[int] = None
+) -> Dict[str, np.ndarray]:
     """
     Find contours in an image and return a list of clickable boxes.
 
     Args:
         image (cv2.typing.MatLike): The input image.
+        max_size (Optional[int]): If given, images whose longest side exceeds it are
+                                  downscaled before edge detection, which is faster but
+                                  rounds the bounds back to image coordinates, so they
+                                  may be off by a couple of pixels.
 
     Returns:
         Dict[str, np.ndarray]: A dictionary where keys are centroids of detected contours
                                 and values are arrays containing the start and end points of the bounding rectangles.
     """
 
+    scale = 1.0
+    if max_size is not None:
+        scale = min(scale, max_size / max(image.shape[:2]))
+    if scale < 1.0:
+        image = cv2.resize(
+            image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
     edged = cv2.Canny(image, 30, 200)
-    contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-    contours_list = []
-    for elem in contours:
-        contours_list.append(elem)
+    # Only the bounding rectangles are needed, so the contour points are never merged
+    rects = np.array([cv2.boundingRect(contour) for contour in contours]).reshape(-1, 4)
+    _, rects = cluster_rects(rects, CLUSTER_THRESHOLD * scale)
+    begins = np.round(rects[:, :2] / scale).astype(np.int32)
+    ends = np.round((rects[:, :2] + rects[:, 2:]) / scale).astype(np.int32)
+    centroids = (begins + ends) // 2
 
-    filters_contours = agglomerative_cluster(contours_list, CLUSTER_THRESHOLD)
-
-    detections = {}
-
-    for cnt in filters_contours:
-        x, y, w, h = cv2.boundingRect(cnt)
-        begin = np.array([x, y])
-        end = np.array([x + w, y + h])
-        centroid = (begin + end) // 2
-        centroid = f"{centroid[0]}:{centroid[1]}"
-        detections[centroid] = np.array([begin, end], dtype=np.int32)
-
-    return detections
+    return {
+        f"{centroid[0]}:{centroid[1]}": bounds
+        for centroid, bounds in zip(centroids, np.stack((begins, ends), axis=1))
+    }
 
 
 def draw_clickable_elements(
@@ -170,15 +289,16 @@ def draw_clickable_elements(
 
     for text, bounds in clickables.items():
         cv2.rectangle(new_image, bounds[0], bounds[1], (0, 255, 0), 2)
-        cv2.putText(
-            new_image,
-            text if with_text else "",
-            (bounds[0][0], bounds[0][1]),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.5,
-            (0, 255, 0),
-            2,
-        )
+        if with_text:
+            cv2.putText(
+                new_image,
+                text,
+                (bounds[0][0], bounds[0][1]),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                (0, 255, 0),
+                2,
+            )
     return new_image
 
 
@@ -276,9 +396,11 @@ def proportional_resize(image, target_width=None, target_height=None):
     return resized_image
 
 
+@lru_cache(maxsize=1)
 def blur_patterns() -> List[cv2.typing.MatLike]:
     """
     Load and blur the patterns used for template matching.
+    The patterns are bundled with the package, so they are loaded only once.
 
     Returns:
         List[cv2.typing.MatLike]: The list of the image patterns of blur button.
@@ -305,19 +427,33 @@ def search_for_patterns(
     Returns:
         Tuple[np.ndarray, int]: The bounding box of the patterns and its index if found, otherwise (-1, -1).
     """
+    threshold = 0.8
+    _, image_threshed = cv2.threshold(image[:, :, 0], 200, 255, cv2.THRESH_BINARY)
     for i, pattern in enumerate(patterns):
         w, h = pattern.shape[::-1]
-        _, image_threshed = cv2.threshold(image[:, :, 0], 200, 255, cv2.THRESH_BINARY)
         res = cv2.matchTemplate(image_threshed, pattern, cv2.TM_CCOEFF_NORMED)
-        threshold = 0.8
-        loc = np.where(res >= threshold)
-        if np.any(loc):
-            _, _, _, top_left = cv2.minMaxLoc(res)
+        _, max_value, _, top_left = cv2.minMaxLoc(res)
+        if max_value >= threshold:
             bottom_right = (top_left[0] + w, top_left[1] + h)
             return (np.array([top_left, bottom_right]), i)
     return (np.array([[-1, -1], [-1, -1]]), -1)
 
 
+def find_longest_line(lines: np.ndarray) -> np.ndarray:
+    """
+    Finds the longest segment among the lines returned by cv2.HoughLinesP.
+
+    Args:
+        lines (np.ndarray): Segments with shape (N, 1, 4) as (x1, y1, x2, y2).
+
+    Returns:
+        np.ndarray: The first segment with the maximum length.
+    """
+    segments = lines[:, 0].astype(np.int64)
+    squared_lengths = np.square(segments[:, 2:] - segments[:, :2]).sum(axis=1)
+    return lines[int(squared_lengths.argmax())][0]
+
+
 def get_middle_blur_circle_bar(image: cv2.typing.MatLike) -> np.ndarray:
     """
     Extracts the middle point of the blur bar from the given image.
@@ -339,15 +475,7 @@ def get_middle_blur_circle_bar(image: cv2.typing.MatLike) -> np.ndarray:
 
     # Get line with the maximum length
     if lines is not None:
-        max_length = 0
-        longest_line = lines[0][0]
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
-            length = np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-            if length > max_length:
-                max_length = length
-                longest_line = line[0]
-
+        longest_line = find_longest_line(lines)
         mid_point = (
             (longest_line[0] + longest_line[2]) // 2,
             (longest_line[1] + longest_line[3]) // 2,
@@ -378,12 +506,6 @@ def get_blur_seekbar(image: cv2.typing.MatLike) -> Line:
     lines = cv2.HoughLinesP(edges, 1, np.pi / 180, 50, None, 50, 10)
     longest_line = Line(x1=-1, y1=-1, x2=-1, y2=-1)
     if lines is not None:
-        max_length = 0
-        longest_line = lines[0][0]
-        for line in lines:
-            x1, y1, x2, y2 = line[0]
-            length = np.sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
-            if length > max_length:
-                max_length = length
-                longest_line = Line(x1=x1, y1=y1 + min_y, x2=x2, y2=y2 + min_y)
+        x1, y1, x2, y2 = find_longest_line(lines)
+        longest_line = Line(x1=x1, y1=y1 + min_y, x2=x2, y2=y2 + min_y)
     return longest_line
@@ -0,0 +1,90 @@
+import struct
+import subprocess
+
+import numpy as np
+import pytest
+
+from camera_mapper import device as device_module
+from camera_mapper.device import Device
+
+WIDTH, HEIGHT = 3, 2
+RGBA = np.arange(WIDTH * HEIGHT * 4, dtype=np.uint8).reshape(HEIGHT, WIDTH, 4)
+
+
+@pytest.fixture
+def device(monkeypatch):
+    monkeypatch.setattr(device_module, "DeviceManager", lambda: None)
+    device = Device()
+    device.serial = "serial"
+    return device
+
+
+def screencap_output(pixel_format=1, color_space=None, pixels=RGBA.tobytes()):
+    header = struct.pack("<III", WIDTH, HEIGHT, pixel_format)
+    if color_space is not None:
+        header += struct.pack("<I", color_space)
+    return header + pixels
+
+
+def fake_run(monkeypatch, stdout=b"", error=None):
+    def run(command, **kwargs):
+        assert command == ["adb", "-s", "serial", "exec-out", "screencap"]
+        assert kwargs["timeout"] > 0
+        if error is not None:
+            raise error
+        return subprocess.CompletedProcess(command, 0, stdout=stdout)
+
+    monkeypatch.setattr(device_module.subprocess, "run", run)
+
+
+@pytest.mark.parametrize("color_space", [None, 1])
+@pytest.mark.parametrize("pixel_format", [1, 2])
+def test_screen_image_decodes_raw_screencap(
+    device, monkeypatch, color_space, pixel_format
+):
+    fake_run(monkeypatch, screencap_output(pixel_format, color_space))
+
+    image = device.screen_image()
+
+    assert image.shape == (HEIGHT, WIDTH, 3)
+    assert np.array_equal(image, RGBA[:, :, 2::-1])
+
+
+def test_screen_image_rejects_unsupported_pixel_format(device, monkeypatch):
+    fake_run(monkeypatch, screencap_output(pixel_format=5))
+
+    with pytest.raises(ValueError, match="pixel format"):
+        device.screen_image()
+
+
+@pytest.mark.parametrize(
+    "stdout",
+    [b"", struct.pack("<II", WIDTH, HEIGHT), screencap_output(pixels=b"\x00" * 8)],
+)
+def test_screen_image_rejects_truncated_output(device, monkeypatch, stdout):
+    fake_run(monkeypatch, stdout)
+
+    with pytest.raises(ValueError):
+        device.screen_image()
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        subprocess.CalledProcessError(1, "adb"),
+        subprocess.TimeoutExpired("adb", 1),
+        FileNotFoundError("adb"),
+    ],
+)
+def test_screen_image_wraps_adb_failures(device, monkeypatch, error):
+    fake_run(monkeypatch, error=error)
+
+    with pytest.raises(RuntimeError):
+        device.screen_image()
+
+
+def test_screen_image_requires_connection(device):
+    device.serial = None
+
+    with pytest.raises(RuntimeError):
+        device.screen_image()
@@ -0,0 +1,107 @@
+import cv2
+import numpy as np
+import pytest
+
+from camera_mapper.screen_processing.image_processing import (
+    agglomerative_cluster,
+    calculate_contour_distance,
+    cluster_rects,
+    merge_contours,
+)
+
+
+def brute_force_cluster(contours, threshold_distance):
+    """
+    Reference clustering that rescans every pair of contours before each merge and
+    concatenates their points in merge order, as `agglomerative_cluster` originally did.
+    """
+    current_contours = list(contours)
+    groups = [[index] for index in range(len(contours))]
+    while len(current_contours) > 1:
+        min_distance, index1, index2 = min(
+            (calculate_contour_distance(current_contours[x], current_contours[y]), x, y)
+            for x in range(len(current_contours) - 1)
+            for y in range(x + 1, len(current_contours))
+        )
+        if not min_distance < threshold_distance:
+            break
+        current_contours[index1] = merge_contours(
+            current_contours[index1], current_contours.pop(index2)
+        )
+        groups[index1].extend(groups.pop(index2))
+    return groups, current_contours
+
+
+def random_rects(rng, count):
+    positions = rng.integers(0, 400, size=(count, 2))
+    sizes = rng.integers(1, 40, size=(count, 2))
+    return np.hstack((positions, sizes))
+
+
+def rect_to_contour(rect):
+    x, y, w, h = rect
+    return np.array([[[x, y]], [[x + w - 1, y + h - 1]]], dtype=np.int32)
+
+
+@pytest.mark.parametrize("seed", range(50))
+@pytest.mark.parametrize("threshold_distance", [0, 5, 15, 40])
+def test_cluster_rects_matches_brute_force(seed, threshold_distance):
+    rng = np.random.default_rng(seed)
+    rects = random_rects(rng, int(rng.integers(2, 40)))
+
+    groups, merged = cluster_rects(rects, threshold_distance)
+
+    expected_groups, expected_contours = brute_force_cluster(
+        [rect_to_contour(rect) for rect in rects], threshold_distance
+    )
+    assert groups == expected_groups
+    assert merged.tolist() == [
+        list(cv2.boundingRect(contour)) for contour in expected_contours
+    ]
+
+
+@pytest.mark.parametrize("seed", range(50))
+@pytest.mark.parametrize("threshold_distance", [5, 15])
+def test_agglomerative_cluster_matches_brute_force(seed, threshold_distance):
+    rng = np.random.default_rng(seed)
+    contours = [
+        rect_to_contour(rect) for rect in random_rects(rng, int(rng.integers(2, 40)))
+    ]
+
+    clustered = agglomerative_cluster(contours, threshold_distance)
+
+    _, expected = brute_force_cluster(contours, threshold_distance)
+    assert len(clustered) == len(expected)
+    for contour, expected_contour in zip(clustered, expected):
+        assert np.array_equal(contour, expected_contour)
+
+
+def test_cluster_rects_breaks_ties_like_brute_force():
+    # Several pairs are at the same distance, so picking any tied partner other than
+    # the lowest one changes the merge order.
+    rects = np.array(
+        [[4, 2, 2, 2], [7, 7, 1, 1], [5, 3, 1, 2], [7, 2, 2, 2], [7, 5, 1, 2]]
+    )
+
+    groups, _ = cluster_rects(rects, 2)
+
+    assert groups == [[0, 2, 1, 4, 3]]
+
+
+def test_cluster_rects_without_pairs():
+    groups, merged = cluster_rects(np.empty((0, 4)), 15)
+    assert groups == []
+    assert merged.shape == (0, 4)
+
+    groups, merged = cluster_rects(np.array([[1, 2, 3, 4]]), 15)
+    assert groups == [[0]]
+    assert merged.tolist() == [[1, 2, 3, 4]]
+
+
+def test_agglomerative_cluster_without_pairs():
+    assert agglomerative_cluster([], 15) == []
+
+    contour = rect_to_contour((1, 2, 3, 4))
+    clustered = agglomerative_cluster([contour], 15)
+    assert len(clustered) == 1
+    assert clustered[0] is contour